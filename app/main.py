@@ -1,11 +1,18 @@
-from fastapi import FastAPI, HTTPException
+import os
+import time
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from app.services.extractor import analyze_url, refine_context_with_llm
-from app.services.ad_library import generate_search_urls, search_ads_real
+from app.services.ad_library import generate_search_urls, search_ads_real, close_browser
 from app.services.analysis import synthesize_and_generate
 from app.services.hooks import generate_strategic_hooks
+from app.services.audit import run_audit, MAX_AUDIT_URLS, MAX_ADS_PER_URL
+from app.services.warmup import warm_up, readiness, record_first_response, schedule_warm_up, WARMUP_ON_STARTUP
+from app.services import metrics
+from app.services.media import cache_ad_media, find_duplicate_visuals, media_cache, sniff_media_type, shutdown as shutdown_media
 from app.models import ProjectContext, AdRecord
 
 app = FastAPI(title="Meta Ad Agent API", version="0.1.0")
@@ -16,8 +23,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    # Stage timings recorded while handling this request land in `trace`;
+    # they are returned as a Server-Timing header when asked for.
+    trace = metrics.start_trace()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        _record_http(request, "500", time.perf_counter() - start)
+        raise
+    elapsed = time.perf_counter() - start
+    _record_http(request, str(response.status_code), elapsed)
+
+    # Streamed bodies (no Content-Length, e.g. /api/bulk-audit) send headers before any stage
+    # has run, so a Server-Timing header there would only ever contain `total`; skip it.
+    streamed = "content-length" not in response.headers
+    if not streamed and (metrics.TRACE_HEADERS_ENABLED or request.headers.get("x-trace") == "1"):
+        response.headers["Server-Timing"] = metrics.format_server_timing(trace + [("total", elapsed)])
+    return response
+
+def _record_http(request: Request, status: str, elapsed: float):
+    endpoint = request.scope.get("endpoint")
+    handler = getattr(endpoint, "__name__", "unmatched")
+    metrics.HTTP_REQUESTS.inc(handler=handler, method=request.method, status=status)
+    metrics.HTTP_SECONDS.observe(elapsed, handler=handler)
+
+class WarmupRequest(BaseModel):
+    components: Optional[List[str]] = None
+
 class UrlRequest(BaseModel):
     url: str
     country: str = "ALL"
@@ -26,10 +64,38 @@ class RefinementRequest(BaseModel):
     context: ProjectContext
     refinement_message: str
 
+@app.on_event("startup")
+async def startup_event():
+    if WARMUP_ON_STARTUP:
+        schedule_warm_up()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await shutdown_media()
+    await close_browser()
+
 @app.get("/")
 def read_root():
+    record_first_response()
     return {"status": "ok", "message": "Meta Ad Agent API is running"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/api/warmup")
+async def warmup_endpoint(request: Optional[WarmupRequest] = None):
+    """Preloads the LLM client, extractor, caches and (optionally) the browser; omit components to warm everything."""
+    try:
+        return await warm_up(request.components if request else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/ready")
+def ready_endpoint():
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 @app.post("/api/extract-context")
 async def extract_context_endpoint(request: UrlRequest):
     try:
@@ -60,10 +126,40 @@ class SearchRequest(BaseModel):
 async def search_ads_endpoint(request: SearchRequest):
     try:
         ads = await search_ads_real(request.keywords, request.country)
-        return {"ads": ads}
+        ads = await cache_ad_media(ads)
+        return {"ads": ads, "duplicate_visuals": find_duplicate_visuals(ads)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/media/{key}")
+def media_endpoint(key: str, request: Request):
+    path = media_cache.path(key)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+
+    # Keys are content hashes, so a cached copy can never go stale.
+    headers = {"Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{key}"'}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        # Evicted by a concurrent put between the lookup and the open.
+        raise HTTPException(status_code=404, detail="Media not found")
+    # Serve from the open handle, which stays readable even if the file is evicted meanwhile.
+    _, content_type = sniff_media_type(f.read(16))
+    f.seek(0)
+    headers["Content-Length"] = str(os.fstat(f.fileno()).st_size)
+    return StreamingResponse(_iter_file(f), media_type=content_type, headers=headers)
+
+def _iter_file(f, chunk_size: int = 64 * 1024):
+    with f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
 class AnalysisRequest(BaseModel):
     items: List[AdRecord]
     context: ProjectContext
@@ -76,6 +172,25 @@ async def analyze_ads_endpoint(request: AnalysisRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class BulkAuditRequest(BaseModel):
+    urls: List[str]
+    country: str = "ALL"
+    max_ads_per_url: int = Field(10, ge=1, le=MAX_ADS_PER_URL)
+
+@app.post("/api/bulk-audit")
+async def bulk_audit_endpoint(request: BulkAuditRequest):
+    """Streams one JSON line per URL (see AuditResult) as each finishes, in completion order."""
+    if not request.urls:
+        raise HTTPException(status_code=400, detail="No URLs provided")
+    if len(request.urls) > MAX_AUDIT_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_AUDIT_URLS} URLs per audit")
+
+    async def stream():
+        async for result in run_audit(request.urls, request.country, request.max_ads_per_url):
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 class HooksRequest(BaseModel):
     context: ProjectContext
     triggers: List[str]
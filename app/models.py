@@ -26,6 +26,22 @@ class AdRecord(BaseModel):
     impressions_lower: Optional[int] = None
     impressions_upper: Optional[int] = None
     media_url: Optional[str] = None # For downloaded or resolved media
+    media_hash: Optional[str] = Field(None, description="sha256 of the downloaded asset; key into the local media cache")
+    cached_media_path: Optional[str] = Field(None, description="API path serving the cached copy of media_url")
+    perceptual_hash: Optional[str] = Field(None, description="64-bit dHash of the image, as hex")
+
+class AuditResult(BaseModel):
+    """Outcome of one URL in a bulk competitor audit."""
+    index: int = Field(..., description="Position of the URL in the request")
+    url: str
+    status: str = Field(default="pending", description="pending, ok, degraded (see fallbacks), or error")
+    failed_stage: Optional[str] = Field(None, description="extract, search, media, or analyze")
+    fallbacks: List[str] = Field(default_factory=list, description="service:reason for each mock or heuristic fallback used")
+    error: Optional[str] = None
+    context: Optional[ProjectContext] = None
+    ads: List[AdRecord] = Field(default_factory=list)
+    analysis: Optional[Dict[str, Any]] = Field(None, description="analyses, synthesis and creatives, as returned by /api/analyze")
+    duration_seconds: Optional[float] = None
 
 class AdAnalysis(BaseModel):
     """Detailed analysis of a single ad."""
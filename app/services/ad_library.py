@@ -2,12 +2,16 @@ from app.models import ProjectContext, AdRecord
 from typing import List, Dict
 import urllib.parse
 import random
-import time
-from playwright.async_api import async_playwright
-from playwright_stealth import Stealth
+import asyncio
+from app.services import metrics
 
 BASE_URL = "https://www.facebook.com/ads/library/"
 
+# One headless Chromium shared by all searches; each search gets its own browser context.
+_playwright = None
+_browser = None
+_browser_lock = None
+
 def generate_search_urls(context: ProjectContext) -> List[Dict[str, str]]:
     urls = []
     country_param = context.country if context.country != "ALL" else "ALL"
@@ -36,10 +40,48 @@ def generate_search_urls(context: ProjectContext) -> List[Dict[str, str]]:
 
     return urls
 
-async def search_ads_real(keywords: List[str], country: str = "ALL") -> List[AdRecord]:
-    """Fetches real ads from Meta Ad Library using Playwright asynchronously."""
+class AdSearchError(Exception):
+    """Raised instead of falling back to mock ads when the caller needs real results."""
+
+def _fallback(keywords: List[str], reason: str, allow_mock: bool) -> List[AdRecord]:
+    if not allow_mock:
+        metrics.record_error("ad_library", reason)
+        raise AdSearchError(f"No real ads available ({reason})")
+    metrics.record_fallback("ad_library", reason)
+    return search_ads_mock(keywords)
+
+async def get_browser():
+    """Returns the shared browser, launching it on first use or after it has disconnected."""
+    global _playwright, _browser, _browser_lock
+    if _browser_lock is None:
+        _browser_lock = asyncio.Lock()
+    async with _browser_lock:
+        if _browser is None or not _browser.is_connected():
+            from playwright.async_api import async_playwright
+            if _playwright is None:
+                _playwright = await async_playwright().start()
+            with metrics.stage("browser_launch"):
+                _browser = await _playwright.chromium.launch(headless=True)
+    return _browser
+
+async def close_browser():
+    global _playwright, _browser
+    if _browser is not None:
+        await _browser.close()
+        _browser = None
+    if _playwright is not None:
+        await _playwright.stop()
+        _playwright = None
+
+async def search_ads_real(keywords: List[str], country: str = "ALL", allow_mock: bool = True) -> List[AdRecord]:
+    """Fetches real ads from Meta Ad Library using Playwright asynchronously.
+
+    When scraping yields nothing, returns mock ads, or raises AdSearchError if `allow_mock` is False.
+    """
+    from playwright_stealth import Stealth
+
     if not keywords:
-        return search_ads_mock(keywords)
+        return _fallback(keywords, "no_keywords", allow_mock)
     
     ads = []
     search_query = " ".join(keywords)
@@ -48,91 +90,97 @@ async def search_ads_real(keywords: List[str], country: str = "ALL") -> List[AdR
     stealth = Stealth()
     
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await context.new_page()
-            await stealth.apply_stealth_async(page)
+        browser = await get_browser()
+        context = await browser.new_context()
+        try:
+            with metrics.stage("browser_context"):
+                page = await context.new_page()
+                await stealth.apply_stealth_async(page)
             
             print(f"Navigating to {search_url}...")
-            await page.goto(search_url, wait_until="networkidle", timeout=60000)
+            with metrics.stage("navigation"):
+                await page.goto(search_url, wait_until="networkidle", timeout=60000)
             
             # Wait for any ad card to appear
             try:
-                await page.wait_for_selector('div[role="article"]', timeout=15000)
-            except:
+                with metrics.stage("wait_for_cards"):
+                    await page.wait_for_selector('div[role="article"]', timeout=15000)
+            except Exception:
                 print("Timeout waiting for ad cards. Meta might be blocking or no results.")
-                await browser.close()
-                return search_ads_mock(keywords)
+                return _fallback(keywords, "no_ad_cards", allow_mock)
 
             # Scroll to load more
             await page.evaluate("window.scrollTo(0, document.body.scrollHeight/2)")
-            time.sleep(1) # Small sleep for rendering
+            await asyncio.sleep(1) # Small sleep for rendering
 
             cards = await page.query_selector_all('div[role="article"]')
             print(f"Found {len(cards)} ad cards.")
 
-            for card in cards[:12]: # Fetch up to 12
-                try:
-                    # Generic extraction logic
-                    # Advertiser is usually a link or text near the top
-                    advertiser = "Unknown Advertiser"
-                    adv_elem = await card.query_selector('a span') or await card.query_selector('span[dir="auto"]')
-                    if adv_elem:
-                        advertiser = await adv_elem.inner_text()
+            with metrics.stage("card_extraction"):
+                for card in cards[:12]: # Fetch up to 12
+                    try:
+                        # Generic extraction logic
+                        # Advertiser is usually a link or text near the top
+                        advertiser = "Unknown Advertiser"
+                        adv_elem = await card.query_selector('a span') or await card.query_selector('span[dir="auto"]')
+                        if adv_elem:
+                            advertiser = await adv_elem.inner_text()
                     
-                    # Primary text is usually the first long text block
-                    primary_text = ""
-                    text_elems = await card.query_selector_all('div')
-                    for te in text_elems:
-                        text = (await te.inner_text()).strip()
-                        if len(text) > 40:
-                            primary_text = text
-                            break
+                        # Primary text is usually the first long text block
+                        primary_text = ""
+                        text_elems = await card.query_selector_all('div')
+                        for te in text_elems:
+                            text = (await te.inner_text()).strip()
+                            if len(text) > 40:
+                                primary_text = text
+                                break
                     
-                    # Headline
-                    headline = ""
-                    headline_elem = await card.query_selector('strong')
-                    if headline_elem:
-                        headline = await headline_elem.inner_text()
-
-                    # Media URL
-                    media_url = None
-                    img_elem = await card.query_selector('img')
-                    if img_elem:
-                        media_url = await img_elem.get_attribute('src')
+                        # Headline
+                        headline = ""
+                        headline_elem = await card.query_selector('strong')
+                        if headline_elem:
+                            headline = await headline_elem.inner_text()
+
+                        # Media URL
+                        media_url = None
+                        img_elem = await card.query_selector('img')
+                        if img_elem:
+                            media_url = await img_elem.get_attribute('src')
                     
-                    # Snapshot URL (Meta ID)
-                    snapshot_url = ""
-                    link_elem = await card.query_selector('a[href*="/ads/library/?id="]')
-                    if link_elem:
-                        snapshot_url = await link_elem.get_attribute('href')
-                        if snapshot_url and not snapshot_url.startswith('http'):
-                            snapshot_url = f"https://www.facebook.com{snapshot_url}"
+                        # Snapshot URL (Meta ID)
+                        snapshot_url = ""
+                        link_elem = await card.query_selector('a[href*="/ads/library/?id="]')
+                        if link_elem:
+                            snapshot_url = await link_elem.get_attribute('href')
+                            if snapshot_url and not snapshot_url.startswith('http'):
+                                snapshot_url = f"https://www.facebook.com{snapshot_url}"
                     
-                    ads.append(AdRecord(
-                        advertiser=advertiser,
-                        snapshot_url=snapshot_url or f"https://www.facebook.com/ads/library/?q={urllib.parse.quote(search_query)}",
-                        primary_text=primary_text,
-                        headline=headline,
-                        media_url=media_url,
-                        media_type="image" if media_url else "unknown",
-                        cta="Learn More",
-                        placements=["Facebook", "Instagram"]
-                    ))
-                except Exception as e:
-                    print(f"Error parsing card: {e}")
-                    continue
-
-            await browser.close()
-            
+                        ads.append(AdRecord(
+                            advertiser=advertiser,
+                            snapshot_url=snapshot_url or f"https://www.facebook.com/ads/library/?q={urllib.parse.quote(search_query)}",
+                            primary_text=primary_text,
+                            headline=headline,
+                            media_url=media_url,
+                            media_type="image" if media_url else "unknown",
+                            cta="Learn More",
+                            placements=["Facebook", "Instagram"]
+                        ))
+                    except Exception as e:
+                        print(f"Error parsing card: {e}")
+                        metrics.record_error("ad_library", "card_parse")
+                        continue
+
             if not ads:
-                return search_ads_mock(keywords)
+                return _fallback(keywords, "no_ads_parsed", allow_mock)
             return ads
+        finally:
+            await context.close()
 
+    except AdSearchError:
+        raise
     except Exception as e:
         print(f"Scraping failed: {e}")
-        return search_ads_mock(keywords)
+        return _fallback(keywords, metrics.classify_error(e, "scrape_error"), allow_mock)
 
 def search_ads_mock(keywords: List[str]) -> List[AdRecord]:
     """Generates mock ads for in-app rendering demo."""
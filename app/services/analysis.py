@@ -1,24 +1,17 @@
 from typing import List
 from app.models import AdRecord, AdAnalysis, Synthesis, GeneratedCreatives, GeneratedCreative, ProjectContext
-
-import os
-import google.generativeai as genai
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+from app.services import metrics
+from app.services.gemini import GEMINI_API_KEY, get_model
 
 class GeminiLLM:
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-flash-latest')
+    @property
+    def model(self):
+        return get_model('gemini-flash-latest')
 
     def analyze_ad(self, ad: AdRecord) -> AdAnalysis:
         if not GEMINI_API_KEY:
             # Fallback to mock if no key
+            metrics.record_fallback("analysis", "no_api_key")
             return self._mock_analyze_ad(ad)
 
         prompt = f"""
@@ -44,9 +37,12 @@ class GeminiLLM:
         """
         
         try:
-            response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+            with metrics.stage("llm.analyze_ad"):
+                response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+            metrics.record_llm_io("analysis", "analyze_ad", prompt, response.text)
             import json
-            data = json.loads(response.text)
+            with metrics.stage("parse.analyze_ad"):
+                data = json.loads(response.text)
             
             return AdAnalysis(
                 ad_snapshot_url=ad.snapshot_url or "",
@@ -63,6 +59,7 @@ class GeminiLLM:
             )
         except Exception as e:
             print(f"Error analyzing ad with Gemini: {e}")
+            metrics.record_fallback("analysis", metrics.classify_error(e))
             return self._mock_analyze_ad(ad)
 
     def _mock_analyze_ad(self, ad: AdRecord) -> AdAnalysis:
@@ -85,6 +82,7 @@ class GeminiLLM:
 
     def synthesize(self, analyses: List[AdAnalysis], context: ProjectContext) -> Synthesis:
         if not GEMINI_API_KEY:
+            metrics.record_fallback("analysis", "no_api_key")
             return self._mock_synthesize(analyses, context)
 
         prompt = f"""
@@ -105,9 +103,12 @@ class GeminiLLM:
         """
         
         try:
-            response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+            with metrics.stage("llm.synthesize"):
+                response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+            metrics.record_llm_io("analysis", "synthesize", prompt, response.text)
             import json
-            data = json.loads(response.text)
+            with metrics.stage("parse.synthesize"):
+                data = json.loads(response.text)
             
             return Synthesis(
                 ad_count=len(analyses),
@@ -119,6 +120,7 @@ class GeminiLLM:
             )
         except Exception as e:
              print(f"Error synthesizing with Gemini: {e}")
+             metrics.record_fallback("analysis", metrics.classify_error(e))
              return self._mock_synthesize(analyses, context)
 
     def _mock_synthesize(self, analyses: List[AdAnalysis], context: ProjectContext) -> Synthesis:
@@ -139,6 +141,7 @@ class GeminiLLM:
 
     def generate_creatives(self, synthesis: Synthesis, context: ProjectContext) -> GeneratedCreatives:
         if not GEMINI_API_KEY:
+            metrics.record_fallback("analysis", "no_api_key")
             return self._mock_generate_creatives(synthesis, context)
             
         prompt = f"""
@@ -158,9 +161,12 @@ class GeminiLLM:
         """
         
         try:
-            response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+            with metrics.stage("llm.generate_creatives"):
+                response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+            metrics.record_llm_io("analysis", "generate_creatives", prompt, response.text)
             import json
-            data = json.loads(response.text)
+            with metrics.stage("parse.generate_creatives"):
+                data = json.loads(response.text)
             
             concepts = []
             for c in data.get("concepts", []):
@@ -170,6 +176,7 @@ class GeminiLLM:
         
         except Exception as e:
             print(f"Error generating creatives with Gemini: {e}")
+            metrics.record_fallback("analysis", metrics.classify_error(e))
             return self._mock_generate_creatives(synthesis, context)
 
     def _mock_generate_creatives(self, synthesis: Synthesis, context: ProjectContext) -> GeneratedCreatives:
@@ -202,9 +209,12 @@ def analyze_ads(ads: List[AdRecord]) -> List[AdAnalysis]:
     return [llm.analyze_ad(ad) for ad in ads]
 
 def synthesize_and_generate(ads: List[AdRecord], context: ProjectContext) -> dict:
-    analyses = analyze_ads(ads)
-    synthesis = llm.synthesize(analyses, context)
-    creatives = llm.generate_creatives(synthesis, context)
+    with metrics.stage("analyze_ads"):
+        analyses = analyze_ads(ads)
+    with metrics.stage("synthesis"):
+        synthesis = llm.synthesize(analyses, context)
+    with metrics.stage("creatives"):
+        creatives = llm.generate_creatives(synthesis, context)
     
     return {
         "analyses": analyses,
@@ -0,0 +1,120 @@
+from app.models import AuditResult
+from app.services import metrics
+from app.services.extractor import analyze_url
+from app.services.ad_library import search_ads_real
+from app.services.media import cache_ad_media
+from app.services.analysis import synthesize_and_generate
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, AsyncIterator
+import asyncio
+import contextvars
+import os
+import time
+
+# Each stage has its own worker pool. Search drives a headless browser, so it gets the fewest slots;
+# extract is mostly a page fetch plus one LLM call; media downloads and hashes creatives; analyze
+# is a burst of LLM calls.
+AUDIT_EXTRACT_CONCURRENCY = int(os.getenv("AUDIT_EXTRACT_CONCURRENCY", "8"))
+AUDIT_SEARCH_CONCURRENCY = int(os.getenv("AUDIT_SEARCH_CONCURRENCY", "2"))
+AUDIT_MEDIA_CONCURRENCY = int(os.getenv("AUDIT_MEDIA_CONCURRENCY", "4"))
+AUDIT_ANALYZE_CONCURRENCY = int(os.getenv("AUDIT_ANALYZE_CONCURRENCY", "4"))
+MAX_AUDIT_URLS = 100
+MAX_ADS_PER_URL = 12  # search_ads_real collects at most 12 cards
+MAX_SEARCH_KEYWORDS = 5
+
+def keywords_for_search(context) -> List[str]:
+    clusters = context.keyword_clusters or {}
+    keywords = clusters.get("primary", []) + clusters.get("secondary", [])
+    if not keywords:
+        # The LLM names clusters by theme (features, pain_points, ...) rather than primary/secondary.
+        keywords = [kw for cluster in clusters.values() for kw in cluster]
+    return keywords[:MAX_SEARCH_KEYWORDS]
+
+def _extract(job: AuditResult, country: str, max_ads: int):
+    job.context = analyze_url(job.url, country)
+
+async def _search(job: AuditResult, country: str, max_ads: int):
+    # No mock fallback here: made-up competitors must never reach an audit report.
+    ads = await search_ads_real(keywords_for_search(job.context), country, allow_mock=False)
+    job.ads = ads[:max_ads]
+
+async def _media(job: AuditResult, country: str, max_ads: int):
+    job.ads = await cache_ad_media(job.ads)
+
+def _analyze(job: AuditResult, country: str, max_ads: int):
+    job.analysis = synthesize_and_generate(job.ads, job.context)
+
+# (name, run, concurrency). Synchronous stages run on a thread pool sized to their limit.
+STAGES = [
+    ("extract", _extract, AUDIT_EXTRACT_CONCURRENCY),
+    ("search", _search, AUDIT_SEARCH_CONCURRENCY),
+    ("media", _media, AUDIT_MEDIA_CONCURRENCY),
+    ("analyze", _analyze, AUDIT_ANALYZE_CONCURRENCY),
+]
+
+async def run_audit(urls: List[str], country: str = "ALL", max_ads: int = 10) -> AsyncIterator[AuditResult]:
+    """Runs extract -> search -> media -> analyze for every URL and yields each result as soon as it finishes.
+
+    A failure in any stage ends that URL's run with status "error"; the rest of the batch carries on.
+    """
+    stages = list(STAGES)
+    loop = asyncio.get_running_loop()
+    queues = [asyncio.Queue() for _ in stages]
+    done: asyncio.Queue = asyncio.Queue()
+    started = {}
+    # A dedicated pool per blocking stage, so its limit isn't capped by the shared default executor.
+    executors = {
+        name: ThreadPoolExecutor(max_workers=max(1, limit), thread_name_prefix=f"audit-{name}")
+        for name, run, limit in stages
+        if not asyncio.iscoroutinefunction(run)
+    }
+
+    async def worker(index: int):
+        name, run, _ = stages[index]
+        inbox = queues[index]
+        while True:
+            job = await inbox.get()
+            try:
+                with metrics.stage(f"audit.{name}"), metrics.collect_fallbacks() as fallbacks:
+                    try:
+                        if name in executors:
+                            # Copy the context so stage timings and fallbacks still reach this job.
+                            ctx = contextvars.copy_context()
+                            await loop.run_in_executor(executors[name], ctx.run, run, job, country, max_ads)
+                        else:
+                            await run(job, country, max_ads)
+                    finally:
+                        job.fallbacks.extend(fallbacks)
+            except Exception as e:
+                print(f"Audit {name} failed for {job.url}: {e}")
+                metrics.record_error("audit", name)
+                job.status = "error"
+                job.failed_stage = name
+                job.error = str(e)
+            if job.status == "error" or index == len(stages) - 1:
+                job.duration_seconds = round(time.perf_counter() - started[job.index], 3)
+                await done.put(job)
+            else:
+                await queues[index + 1].put(job)
+
+    workers = [
+        asyncio.create_task(worker(index))
+        for index, (_, _, limit) in enumerate(stages)
+        for _ in range(max(1, limit))
+    ]
+    try:
+        for i, url in enumerate(urls):
+            started[i] = time.perf_counter()
+            queues[0].put_nowait(AuditResult(index=i, url=url))
+        for _ in urls:
+            job = await done.get()
+            if job.status != "error":
+                # Mock analyses or heuristic contexts are real output, but not what was asked for.
+                job.status = "degraded" if job.fallbacks else "ok"
+            yield job
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for executor in executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -1,26 +1,25 @@
-import trafilatura
 from collections import Counter
 import re
 from typing import List, Dict
 from app.models import ProjectContext
+from app.services import metrics
+from app.services.gemini import GEMINI_API_KEY, get_model
 
 def extract_text_from_url(url: str) -> str:
-    downloaded = trafilatura.fetch_url(url)
+    import trafilatura
+    with metrics.stage("fetch"):
+        downloaded = trafilatura.fetch_url(url)
     if not downloaded:
+        metrics.record_error("extractor", "fetch_failed")
         raise ValueError(f"Could not fetch URL: {url}")
-    text = trafilatura.extract(downloaded)
+    with metrics.stage("extract"):
+        text = trafilatura.extract(downloaded)
     if not text:
+        metrics.record_error("extractor", "empty_content")
         raise ValueError(f"Could not extract text from URL: {url}")
     return text
 
-import os
 import json
-import google.generativeai as genai
-
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
 
 def extract_keywords(text: str, top_n: int = 10) -> List[str]:
     # Fallback to simple extraction if LLM fails or for redundancy
@@ -33,6 +32,7 @@ def extract_keywords(text: str, top_n: int = 10) -> List[str]:
 def analyze_url_with_llm(text: str, url: str) -> Dict:
     if not GEMINI_API_KEY:
         print("Warning: GEMINI_API_KEY not found. Using heuristics.")
+        metrics.record_fallback("extractor", "no_api_key")
         return {}
 
     prompt = f"""
@@ -49,14 +49,18 @@ def analyze_url_with_llm(text: str, url: str) -> Dict:
     - offer_constraints: A list of noticed constraints (e.g., "US only", "requires demo", "subscription based").
     """
 
-    model = genai.GenerativeModel('gemini-flash-latest')
+    model = get_model('gemini-flash-latest')
     try:
-        response = model.generate_content(prompt)
+        with metrics.stage("llm.analyze_url"):
+            response = model.generate_content(prompt)
+        metrics.record_llm_io("extractor", "analyze_url", prompt, response.text)
         content = response.text.replace('```json', '').replace('```', '').strip()
-        data = json.loads(content)
+        with metrics.stage("parse.analyze_url"):
+            data = json.loads(content)
         return data
     except Exception as e:
         print(f"Error calling Gemini: {e}")
+        metrics.record_fallback("extractor", metrics.classify_error(e))
         return {}
 
 def analyze_url(url: str, country: str = "ALL") -> ProjectContext:
@@ -95,6 +99,7 @@ def analyze_url(url: str, country: str = "ALL") -> ProjectContext:
 
 def refine_context_with_llm(context: ProjectContext, refinement_message: str) -> ProjectContext:
     if not GEMINI_API_KEY:
+        metrics.record_fallback("extractor", "no_api_key")
         context.icp += f" (Refined: {refinement_message})"
         return context
 
@@ -111,12 +116,15 @@ def refine_context_with_llm(context: ProjectContext, refinement_message: str) ->
     Keys: product_idea, category, icp, keyword_clusters, offer_constraints.
     """
 
-    model = genai.GenerativeModel('gemini-flash-latest')
+    model = get_model('gemini-flash-latest')
     try:
-        response = model.generate_content(prompt)
+        with metrics.stage("llm.refine_context"):
+            response = model.generate_content(prompt)
+        metrics.record_llm_io("extractor", "refine_context", prompt, response.text)
         content = response.text.replace('```json', '').replace('```', '').strip()
         import json
-        data = json.loads(content)
+        with metrics.stage("parse.refine_context"):
+            data = json.loads(content)
         
         # Patch the context
         for key, value in data.items():
@@ -126,5 +134,6 @@ def refine_context_with_llm(context: ProjectContext, refinement_message: str) ->
         return context
     except Exception as e:
         print(f"Error refining with Gemini: {e}")
+        metrics.record_fallback("extractor", metrics.classify_error(e))
         context.icp += f" (Refined: {refinement_message})"
         return context
@@ -0,0 +1,33 @@
+import os
+import threading
+from typing import Dict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# Every model the services use; warm-up instantiates all of them.
+MODEL_NAMES = ("gemini-flash-latest", "gemini-1.5-flash")
+
+_genai = None
+_models: Dict[str, object] = {}
+_lock = threading.Lock()
+
+def get_genai():
+    """Imports and configures google.generativeai on first use (the import alone takes seconds)."""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+                if GEMINI_API_KEY:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                _genai = genai
+    return _genai
+
+def get_model(name: str = "gemini-flash-latest"):
+    model = _models.get(name)
+    if model is None:
+        model = _models[name] = get_genai().GenerativeModel(name)
+    return model
@@ -1,14 +1,11 @@
-import os
 import json
-import google.generativeai as genai
 from typing import List, Dict
 from app.models import ProjectContext
+from app.services import metrics
+from app.services.gemini import GEMINI_API_KEY, get_model
 
-# Setup Gemini
-api_key = os.environ.get("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
-else:
+api_key = GEMINI_API_KEY
+if not api_key:
     print("Warning: GEMINI_API_KEY not found in hooks service.")
 
 def generate_strategic_hooks(context: ProjectContext, triggers: List[str]) -> List[Dict[str, str]]:
@@ -16,6 +13,7 @@ def generate_strategic_hooks(context: ProjectContext, triggers: List[str]) -> Li
     # Hardcoded check for placeholder keys to force mock behavior for demo
     is_placeholder = not api_key or "your-" in api_key or api_key == "dummy"
     if is_placeholder:
+        metrics.record_fallback("hooks", "no_api_key")
         return [
             {"text": f"Is your {context.category} approach costing you clients?", "trigger": "Fear", "angle": "Opportunity Cost"},
             {"text": f"The secret to scaling {context.category} in 2026.", "trigger": "Curiosity", "angle": "Future-Proofing"},
@@ -46,8 +44,10 @@ def generate_strategic_hooks(context: ProjectContext, triggers: List[str]) -> Li
     """
 
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
+        model = get_model('gemini-1.5-flash')
+        with metrics.stage("llm.generate_hooks"):
+            response = model.generate_content(prompt)
+        metrics.record_llm_io("hooks", "generate_hooks", prompt, response.text)
         # Clean up JSON from response
         content = response.text.strip()
         if "```json" in content:
@@ -55,9 +55,11 @@ def generate_strategic_hooks(context: ProjectContext, triggers: List[str]) -> Li
         elif "```" in content:
             content = content.split("```")[1].split("```")[0].strip()
         
-        return json.loads(content)
+        with metrics.stage("parse.generate_hooks"):
+            return json.loads(content)
     except Exception as e:
         print(f"Hook generation failed: {e}")
+        metrics.record_fallback("hooks", metrics.classify_error(e))
         return [
             {"text": f"Tired of struggling with {context.category}?", "trigger": "Pain", "angle": "Empathy"},
             {"text": f"What if you could automate your entire {context.category} workflow?", "trigger": "Greed", "angle": "Efficiency"}
@@ -0,0 +1,333 @@
+from app.models import AdRecord
+from app.services import metrics
+from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", os.path.join(".cache", "media"))
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+MEDIA_MAX_ASSET_BYTES = 20 * 1024 * 1024
+MEDIA_PER_HOST_LIMIT = int(os.getenv("MEDIA_PER_HOST_LIMIT", "4"))
+MEDIA_TOTAL_LIMIT = int(os.getenv("MEDIA_TOTAL_LIMIT", "16"))
+MEDIA_HASH_WORKERS = int(os.getenv("MEDIA_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Max Hamming distance between two 64-bit dHashes for the visuals to count as the same creative.
+DUPLICATE_MAX_DISTANCE = 6
+# Flat or solid-colour images hash to (nearly) all zeros, so they would all "match" each other.
+MIN_HASH_BITS = 4
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+def sniff_media_type(head: bytes) -> Tuple[str, str]:
+    """Returns (media_type, content_type) from the file's magic bytes."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image", "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image", "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image", "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image", "image/webp"
+    if head[4:8] == b"ftyp":
+        return "video", "video/mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video", "video/webm"
+    return "unknown", "application/octet-stream"
+
+class MediaCache:
+    """Content-addressed disk cache: each file is named by the sha256 of its bytes.
+
+    Once the directory grows past `max_bytes`, the least recently used files are evicted.
+    """
+    def __init__(self, root: str = MEDIA_CACHE_DIR, max_bytes: int = MEDIA_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+    def _load(self):
+        # Rebuild the LRU order from mtimes, which `path()` bumps on every hit.
+        os.makedirs(self.root, exist_ok=True)
+        found = []
+        for name in os.listdir(self.root):
+            if _KEY_RE.match(name):
+                st = os.stat(os.path.join(self.root, name))
+                found.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._total += size
+        self._loaded = True
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def path(self, key: str) -> Optional[str]:
+        if not _KEY_RE.match(key):
+            return None
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        path = self._file(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, data: bytes) -> str:
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return key
+            tmp = self._file(f"{key}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._file(key))
+            self._entries[key] = len(data)
+            self._total += len(data)
+            self._evict()
+        return key
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self._file(key))
+            except FileNotFoundError:
+                pass
+
+class MediaFetcher:
+    """Downloads assets over one pooled HTTP client, with at most `per_host_limit` requests in flight per host."""
+    def __init__(self, cache: MediaCache, per_host_limit: int = MEDIA_PER_HOST_LIMIT, total_limit: int = MEDIA_TOTAL_LIMIT):
+        self.cache = cache
+        self.per_host_limit = per_host_limit
+        self.total_limit = total_limit
+        self._client = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        # Signed CDN URLs are reused within a session, so remember what each one resolved to.
+        self._resolved: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+
+    def get_client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.total_limit, max_keepalive_connections=self.total_limit),
+                timeout=httpx.Timeout(15.0),
+                follow_redirects=True,
+                headers={"User-Agent": "Mozilla/5.0 (compatible; AdsWizrd/0.1)"},
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    async def fetch(self, url: str) -> Optional[Tuple[str, str]]:
+        """Downloads `url` into the cache and returns (key, media_type), or None on failure."""
+        resolved = self._resolved.get(url)
+        if resolved and self.cache.path(resolved[0]):
+            return resolved
+
+        try:
+            async with self._host_limit(url):
+                async with self.get_client().stream("GET", url) as response:
+                    response.raise_for_status()
+                    chunks = []
+                    size = 0
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                        if size > MEDIA_MAX_ASSET_BYTES:
+                            raise ValueError(f"Asset larger than {MEDIA_MAX_ASSET_BYTES} bytes")
+                        chunks.append(chunk)
+            data = b"".join(chunks)
+            key = await asyncio.to_thread(self.cache.put, data)
+        except Exception as e:
+            print(f"Media fetch failed for {url}: {e}")
+            metrics.record_error("media", metrics.classify_error(e, "fetch_error"))
+            return None
+
+        media_type, _ = sniff_media_type(data[:16])
+        self._resolved[url] = (key, media_type)
+        if len(self._resolved) > 4096:
+            self._resolved.popitem(last=False)
+        return key, media_type
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+def dhash_file(path: str) -> Optional[str]:
+    """64-bit difference hash of an image file, as 16 hex chars. Runs in worker processes."""
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            small = img.convert("L").resize((9, 8), Image.LANCZOS)
+            pixels = small.tobytes()
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:016x}"
+
+def hamming_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+def is_low_information(phash: str) -> bool:
+    bits = bin(int(phash, 16)).count("1")
+    return bits < MIN_HASH_BITS or bits > 64 - MIN_HASH_BITS
+
+media_cache = MediaCache()
+media_fetcher = MediaFetcher(media_cache)
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+# Content keys never change meaning, so a perceptual hash is computed at most once per file.
+_phash_by_key: Dict[str, str] = {}
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    # Called from both the event loop and the warm-up thread.
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # spawn rather than fork: the API process is multi-threaded by the time this runs.
+            _hash_pool = ProcessPoolExecutor(max_workers=MEDIA_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _hash_pool
+
+def warm_hash_pool():
+    """Starts every worker process now, so the first search doesn't pay for spawning them."""
+    global _hash_pool
+    pool = _get_hash_pool()
+    try:
+        for future in [pool.submit(dhash_file, "") for _ in range(MEDIA_HASH_WORKERS)]:
+            future.result()
+    except BrokenProcessPool:
+        # Drop the dead pool so the next warm-up (or search) starts a fresh one.
+        with _hash_pool_lock:
+            if _hash_pool is pool:
+                _hash_pool = None
+        raise
+
+async def perceptual_hashes(keys: List[str]) -> Dict[str, Optional[str]]:
+    """Hashes the given cached images; keys that can't be hashed map to None."""
+    global _hash_pool
+    loop = asyncio.get_running_loop()
+    paths = {}
+    for key in dict.fromkeys(keys):
+        if key not in _phash_by_key:
+            path = media_cache.path(key)
+            if path:
+                paths[key] = path
+    if paths:
+        pool = None
+        try:
+            pool = _get_hash_pool()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, dhash_file, path) for path in paths.values()
+            ))
+        except Exception as e:
+            print(f"Perceptual hashing failed: {e}")
+            metrics.record_error("media", "hash_error")
+            if isinstance(e, BrokenProcessPool):
+                # A dead pool never recovers; start a fresh one on the next call.
+                with _hash_pool_lock:
+                    if _hash_pool is pool:
+                        _hash_pool = None
+            results = [None] * len(paths)
+        # Only remember real hashes, so a failure or unreadable file is retried next time.
+        _phash_by_key.update((k, h) for k, h in zip(paths, results) if h is not None)
+    return {k: _phash_by_key.get(k) for k in keys}
+
+async def cache_ad_media(ads: List[AdRecord]) -> List[AdRecord]:
+    """Downloads every ad's media into the local cache, then fills in the hashes, the local path and the sniffed media type."""
+    targets = [ad for ad in ads if ad.media_url]
+    if not targets:
+        return ads
+
+    with metrics.stage("media_fetch"):
+        fetched = await asyncio.gather(*(media_fetcher.fetch(ad.media_url) for ad in targets))
+
+    image_keys = []
+    for ad, result in zip(targets, fetched):
+        if result is None:
+            continue
+        key, media_type = result
+        ad.media_hash = key
+        ad.cached_media_path = f"/api/media/{key}"
+        if media_type != "unknown":
+            ad.media_type = media_type
+        if media_type == "image":
+            image_keys.append(key)
+
+    if image_keys:
+        with metrics.stage("perceptual_hash"):
+            hashes = await perceptual_hashes(image_keys)
+        for ad in targets:
+            if ad.media_hash in hashes:
+                ad.perceptual_hash = hashes[ad.media_hash]
+    return ads
+
+def find_duplicate_visuals(ads: List[AdRecord], max_distance: int = DUPLICATE_MAX_DISTANCE) -> List[Dict]:
+    """Groups ads whose images are perceptually identical and that were run by more than one advertiser."""
+    hashed = [ad for ad in ads if ad.perceptual_hash and not is_low_information(ad.perceptual_hash)]
+    parent = list(range(len(hashed)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(hashed)):
+        for j in range(i + 1, len(hashed)):
+            if hamming_distance(hashed[i].perceptual_hash, hashed[j].perceptual_hash) <= max_distance:
+                parent[find(j)] = find(i)
+
+    groups: Dict[int, List[AdRecord]] = {}
+    for i, ad in enumerate(hashed):
+        groups.setdefault(find(i), []).append(ad)
+
+    duplicates = []
+    for members in groups.values():
+        advertisers = sorted({ad.advertiser for ad in members})
+        if len(advertisers) < 2:
+            continue
+        duplicates.append({
+            "perceptual_hash": members[0].perceptual_hash,
+            "advertisers": advertisers,
+            "snapshot_urls": [ad.snapshot_url for ad in members],
+        })
+    return duplicates
+
+async def shutdown():
+    await media_fetcher.aclose()
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False)
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# Stage latencies span ~1ms (JSON parsing) to ~60s (page navigation).
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+TRACE_HEADERS_ENABLED = os.getenv("TRACE_HEADERS", "").lower() in ("1", "true", "yes")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(
+        '%s="%s"' % (k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    """Monotonic counter, one series per label set."""
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Gauge:
+    """Point-in-time value, one series per label set."""
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[_label_key(labels)] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for key, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Fixed-bucket histogram. Buckets are stored non-cumulative and summed at render time."""
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(_label_key(labels))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(s[0]), s[1], s[2]) for key, s in self._series.items()]
+        for key, counts, total, n in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {n}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        metric = Gauge(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DURATION_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram("adswizrd_stage_duration_seconds", "Time spent in each pipeline stage.")
+LLM_PROMPT_BYTES = registry.histogram("adswizrd_llm_prompt_bytes", "Size of prompts sent to the LLM.", SIZE_BUCKETS)
+LLM_RESPONSE_BYTES = registry.histogram("adswizrd_llm_response_bytes", "Size of LLM response bodies.", SIZE_BUCKETS)
+FALLBACKS = registry.counter("adswizrd_fallbacks_total", "Times a service fell back to mock or heuristic output.")
+ERRORS = registry.counter("adswizrd_errors_total", "Errors caught inside services.")
+HTTP_REQUESTS = registry.counter("adswizrd_http_requests_total", "HTTP requests served.")
+HTTP_SECONDS = registry.histogram("adswizrd_http_request_duration_seconds", "End-to-end HTTP request latency.")
+STARTUP_SECONDS = registry.gauge("adswizrd_startup_seconds", "Seconds from process start to the first healthy / response.")
+WARMUP_SECONDS = registry.gauge("adswizrd_warmup_seconds", "Duration of the last warm-up of each component.")
+
+# Per-request list of (stage, seconds); only populated while a trace is active.
+_trace: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("adswizrd_trace", default=None)
+
+# Per-block list of "service:reason" fallbacks; only populated inside collect_fallbacks().
+_fallbacks: ContextVar[Optional[List[str]]] = ContextVar("adswizrd_fallbacks", default=None)
+
+def start_trace() -> List[Tuple[str, float]]:
+    trace: List[Tuple[str, float]] = []
+    _trace.set(trace)
+    return trace
+
+def format_server_timing(trace: List[Tuple[str, float]]) -> str:
+    """Renders a trace as a Server-Timing header value (durations in ms)."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in trace)
+
+@contextmanager
+def stage(name: str):
+    """Times a block under the given stage label, and adds it to the active request trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((name, elapsed))
+
+def record_llm_io(service: str, operation: str, prompt: str, response_text: Optional[str]) -> None:
+    LLM_PROMPT_BYTES.observe(len(prompt.encode("utf-8")), service=service, operation=operation)
+    if response_text is not None:
+        LLM_RESPONSE_BYTES.observe(len(response_text.encode("utf-8")), service=service, operation=operation)
+
+@contextmanager
+def collect_fallbacks():
+    """Collects every fallback recorded inside the block, including from threads run in a copied context."""
+    collected: List[str] = []
+    token = _fallbacks.set(collected)
+    try:
+        yield collected
+    finally:
+        _fallbacks.reset(token)
+
+def record_fallback(service: str, reason: str) -> None:
+    FALLBACKS.inc(service=service, reason=reason)
+    collected = _fallbacks.get()
+    if collected is not None:
+        collected.append(f"{service}:{reason}")
+
+def record_error(service: str, reason: str) -> None:
+    ERRORS.inc(service=service, reason=reason)
+
+def classify_error(exc: Exception, default: str = "llm_error") -> str:
+    """Maps an exception onto a small, fixed set of reason labels."""
+    if isinstance(exc, json.JSONDecodeError):
+        return "parse_error"
+    if isinstance(exc, TimeoutError) or "Timeout" in type(exc).__name__:
+        return "timeout"
+    return default
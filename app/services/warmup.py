@@ -0,0 +1,103 @@
+from app.services import metrics
+from app.services.gemini import MODEL_NAMES, get_model
+from app.services.media import media_cache, media_fetcher, warm_hash_pool
+from app.services.ad_library import get_browser
+from typing import List, Dict, Optional
+import asyncio
+import os
+import time
+
+_IMPORTED_AT = time.monotonic()
+
+# Components that must be warm before /api/ready reports ready. The browser is left out by
+# default: launching Chromium is the slowest step and only the search endpoints need it.
+READY_COMPONENTS = [c.strip() for c in os.getenv("READY_COMPONENTS", "llm,extractor,caches").split(",") if c.strip()]
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "").lower() in ("1", "true", "yes")
+
+_status: Dict[str, Dict] = {}
+_startup_seconds: Optional[float] = None
+_background_task: Optional[asyncio.Task] = None
+
+def process_uptime() -> float:
+    """Seconds since this process started, read from /proc where available."""
+    try:
+        with open("/proc/self/stat") as f:
+            # starttime is field 22; split after the ')' that closes the command name, which may contain spaces.
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _IMPORTED_AT
+
+def record_first_response():
+    global _startup_seconds
+    if _startup_seconds is None:
+        _startup_seconds = round(process_uptime(), 3)
+        metrics.STARTUP_SECONDS.set(_startup_seconds)
+        print(f"First healthy response {_startup_seconds}s after process start.")
+
+def _warm_llm():
+    for name in MODEL_NAMES:
+        get_model(name)
+
+def _warm_extractor():
+    import trafilatura  # noqa: F401
+
+def _warm_caches():
+    media_cache.load()
+    media_fetcher.get_client()
+    warm_hash_pool()
+
+async def _warm_browser():
+    # Launches the shared browser that search_ads_real reuses.
+    import playwright_stealth  # noqa: F401
+    await get_browser()
+
+COMPONENTS = {
+    "llm": _warm_llm,
+    "extractor": _warm_extractor,
+    "caches": _warm_caches,
+    "browser": _warm_browser,
+}
+
+async def _run(name: str):
+    start = time.perf_counter()
+    try:
+        warm = COMPONENTS[name]
+        if asyncio.iscoroutinefunction(warm):
+            await warm()
+        else:
+            await asyncio.to_thread(warm)
+        error = None
+    except Exception as e:
+        print(f"Warm-up of {name} failed: {e}")
+        metrics.record_error("warmup", name)
+        error = str(e)
+    elapsed = time.perf_counter() - start
+    metrics.WARMUP_SECONDS.set(elapsed, component=name)
+    _status[name] = {"ready": error is None, "seconds": round(elapsed, 3), "error": error}
+
+async def warm_up(components: Optional[List[str]] = None) -> Dict:
+    """Loads the given components (all of them by default) concurrently and returns the readiness status."""
+    names = components or list(COMPONENTS)
+    unknown = [n for n in names if n not in COMPONENTS]
+    if unknown:
+        raise ValueError(f"Unknown warm-up components: {', '.join(unknown)}")
+    await asyncio.gather(*(_run(name) for name in names))
+    return readiness()
+
+def schedule_warm_up():
+    global _background_task
+    _background_task = asyncio.create_task(warm_up())
+
+def is_ready() -> bool:
+    return all(_status.get(name, {}).get("ready") for name in READY_COMPONENTS)
+
+def readiness() -> Dict:
+    return {
+        "ready": is_ready(),
+        "required": READY_COMPONENTS,
+        "components": dict(_status),
+        "startup_seconds": _startup_seconds,
+    }
@@ -0,0 +1,99 @@
+"""Startup benchmark for the API process.
+
+Reports:
+  1. import-time profile of `app.main` (python -X importtime), slowest modules first
+  2. time from launching uvicorn to the first healthy `/` response
+  3. per-component /api/warmup timings
+
+Usage: python bench_startup.py [--port 8765] [--top 15] [--skip-warmup]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import requests
+
+# Dependencies that should only load on demand; any of these in the import profile is a regression.
+LAZY_MODULES = ["google.generativeai", "playwright", "playwright_stealth", "trafilatura", "PIL", "httpx"]
+
+def _import_rows(code: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        raise SystemExit(f"Running {code!r} failed")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        # Nested imports are indented after the single separating space.
+        rows.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+    return rows
+
+def profile_imports(top: int):
+    # Drop whatever the bare interpreter imports (site, encodings, ...) so only app.main's cost remains.
+    baseline = {name.strip() for _, _, name in _import_rows("pass")}
+    rows = [r for r in _import_rows("import app.main") if r[2].strip() not in baseline]
+
+    top_level = [r for r in rows if not r[2].startswith(" ")]
+    total_ms = sum(r[0] for r in top_level) / 1000
+    print(f"== Import profile: import app.main took {total_ms:.1f} ms ==")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>14.1f} {self_us / 1000:>9.1f}  {name.strip()}")
+
+    loaded = {r[2].strip() for r in rows}
+    eager = [m for m in LAZY_MODULES if m in loaded]
+    print(f"Heavy modules loaded at import: {', '.join(eager) if eager else 'none'}")
+    print()
+
+def measure_startup(port: int, skip_warmup: bool):
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise SystemExit("uvicorn exited before serving /")
+            if time.perf_counter() - started > 60:
+                raise SystemExit("No healthy / response within 60s")
+            try:
+                if requests.get(f"{base}/", timeout=1).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                time.sleep(0.02)
+        elapsed = time.perf_counter() - started
+        print("== Startup ==")
+        print(f"Process launch to first healthy /: {elapsed * 1000:.0f} ms (client side)")
+        print(f"Server-reported startup_seconds: {requests.get(f'{base}/api/ready').json()['startup_seconds']}")
+
+        if not skip_warmup:
+            start = time.perf_counter()
+            status = requests.post(f"{base}/api/warmup", timeout=300).json()
+            print(f"\n== Warm-up ({(time.perf_counter() - start) * 1000:.0f} ms total) ==")
+            for name, component in status["components"].items():
+                state = "ok" if component["ready"] else f"failed: {component['error']}"
+                print(f"{name:>10}: {component['seconds'] * 1000:>8.0f} ms  {state}")
+            print(f"Ready: {status['ready']}")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--skip-warmup", action="store_true")
+    args = parser.parse_args()
+
+    profile_imports(args.top)
+    measure_startup(args.port, args.skip_warmup)
@@ -427,6 +427,10 @@ export default function Home() {
                             <div className="gallery-grid">
                                 {ads.map((ad, i) => {
                                     const isSelected = selectedAds.includes(ad.snapshot_url);
+                                    // Prefer the API's cached copy: the signed CDN URL in media_url expires quickly.
+                                    const mediaSrc = ad.cached_media_path
+                                        ? `${process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'}${ad.cached_media_path}`
+                                        : ad.media_url;
                                     return (
                                         <div
                                             key={i}
@@ -435,12 +439,12 @@ export default function Home() {
                                         >
                                             <div className="relative aspect-[4/5] bg-neutral-900 flex items-center justify-center overflow-hidden">
                                                 {/* Fallback blurred background for aspect ratio containment */}
-                                                {ad.media_url && (
-                                                    <img src={ad.media_url} className="absolute inset-0 w-full h-full object-cover blur-2xl opacity-20 scale-150" alt="" />
+                                                {mediaSrc && (
+                                                    <img src={mediaSrc} className="absolute inset-0 w-full h-full object-cover blur-2xl opacity-20 scale-150" alt="" />
                                                 )}
 
-                                                {ad.media_url ? (
-                                                    <img src={ad.media_url} className="relative z-10 w-full h-full object-contain grayscale-[0.3] group-hover:grayscale-0 transition-all duration-700" alt="ad" />
+                                                {mediaSrc ? (
+                                                    <img src={mediaSrc} className="relative z-10 w-full h-full object-contain grayscale-[0.3] group-hover:grayscale-0 transition-all duration-700" alt="ad" />
                                                 ) : (
                                                     <div className="relative z-10 w-full h-full flex flex-col items-center justify-center text-neutral-800 gap-2">
                                                         {ad.media_type === 'video' ? <Play className="icon-lg" /> : <ImageIcon className="icon-lg" />}
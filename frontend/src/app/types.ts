@@ -7,6 +7,9 @@ export interface AdRecord {
     media_type: string;
     placements: string[];
     media_url?: string;
+    media_hash?: string;
+    cached_media_path?: string;
+    perceptual_hash?: string;
 }
 
 export interface AdAnalysis {
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import AdRecord
+from app.services import audit, ad_library, metrics
+from app.services.ad_library import AdSearchError
+
+def collect(urls, **kwargs):
+    async def run():
+        return [result async for result in audit.run_audit(urls, **kwargs)]
+    return asyncio.run(run())
+
+def fake_ad():
+    return AdRecord(advertiser="Rival", snapshot_url="https://www.facebook.com/ads/library/?id=1")
+
+async def fake_search(job, country, max_ads):
+    if job.url == "https://blocked.example":
+        raise AdSearchError("No real ads available (no_ad_cards)")
+    job.ads = [fake_ad()][:max_ads]
+
+async def fake_media(job, country, max_ads):
+    pass
+
+def fake_extract(job, country, max_ads):
+    job.context = None
+
+def fake_analyze(job, country, max_ads):
+    job.analysis = {"ads": len(job.ads)}
+
+def test_failed_url_does_not_stop_batch(monkeypatch):
+    monkeypatch.setattr(audit, "STAGES", [
+        ("extract", fake_extract, 2),
+        ("search", fake_search, 1),
+        ("media", fake_media, 1),
+        ("analyze", fake_analyze, 2),
+    ])
+    urls = ["https://a.example", "https://blocked.example", "https://b.example"]
+    results = {r.url: r for r in collect(urls)}
+
+    assert set(results) == set(urls)
+    assert results["https://blocked.example"].status == "error"
+    assert results["https://blocked.example"].failed_stage == "search"
+    assert results["https://blocked.example"].analysis is None
+    for url in ("https://a.example", "https://b.example"):
+        assert results[url].status == "ok"
+        assert results[url].analysis == {"ads": 1}
+
+def test_blocking_stage_runs_up_to_its_limit(monkeypatch):
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def slow_extract(job, country, max_ads):
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.1)
+        with lock:
+            running["now"] -= 1
+
+    monkeypatch.setattr(audit, "STAGES", [("extract", slow_extract, 8)])
+    results = collect([f"https://{i}.example" for i in range(16)])
+
+    assert all(r.status == "ok" for r in results)
+    assert running["peak"] == 8
+
+def test_search_stage_never_uses_mock_ads(monkeypatch):
+    async def no_results(keywords, country="ALL", allow_mock=True):
+        assert allow_mock is False
+        raise AdSearchError("No real ads available (no_ads_parsed)")
+    monkeypatch.setattr(audit, "search_ads_real", no_results)
+
+    job = audit.AuditResult(index=0, url="https://a.example")
+    job.context = ad_library.ProjectContext(category="SaaS", icp="Founders", keyword_clusters={"primary": ["crm"]})
+    with pytest.raises(AdSearchError):
+        asyncio.run(audit._search(job, "ALL", 10))
+
+@pytest.mark.parametrize("max_ads", [-1, 0, audit.MAX_ADS_PER_URL + 1])
+def test_bulk_audit_rejects_bad_max_ads(max_ads):
+    client = TestClient(app)
+    response = client.post("/api/bulk-audit", json={"urls": ["https://a.example"], "max_ads_per_url": max_ads})
+    assert response.status_code == 422
+
+def test_mock_analysis_marks_result_degraded(monkeypatch):
+    def mock_analyze(job, country, max_ads):
+        metrics.record_fallback("analysis", "llm_error")
+        job.analysis = {}
+    monkeypatch.setattr(audit, "STAGES", [("extract", fake_extract, 1), ("analyze", mock_analyze, 1)])
+
+    [result] = collect(["https://a.example"])
+    assert result.status == "degraded"
+    assert result.fallbacks == ["analysis:llm_error"]
+
+class StuckPage:
+    waiting = None  # asyncio.Event, set once a search is blocked on ad cards
+
+    async def goto(self, *args, **kwargs):
+        pass
+
+    async def wait_for_selector(self, *args, **kwargs):
+        if StuckPage.waiting is not None:
+            StuckPage.waiting.set()
+        await asyncio.sleep(3600)
+
+class FakeContext:
+    async def new_page(self):
+        return StuckPage()
+
+    async def close(self):
+        pass
+
+class FakeBrowser:
+    async def new_context(self):
+        return FakeContext()
+
+class FakeStealth:
+    async def apply_stealth_async(self, page):
+        pass
+
+@pytest.fixture
+def stuck_browser(monkeypatch):
+    import playwright_stealth
+
+    async def get_browser():
+        return FakeBrowser()
+    monkeypatch.setattr(ad_library, "get_browser", get_browser)
+    monkeypatch.setattr(playwright_stealth, "Stealth", FakeStealth)
+
+def test_search_propagates_cancellation(stuck_browser):
+    async def run():
+        task = asyncio.create_task(ad_library.search_ads_real(["crm"], allow_mock=False))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(run())
+
+def test_cancelled_audit_cleans_up(monkeypatch, stuck_browser):
+    def extract(job, country, max_ads):
+        if job.url == "https://bad.example":
+            raise ValueError("Could not fetch URL")
+        job.context = ad_library.ProjectContext(category="SaaS", icp="Founders", keyword_clusters={"primary": ["crm"]})
+    monkeypatch.setattr(audit, "STAGES", [("extract", extract, 2), ("search", audit._search, 1)])
+
+    async def run():
+        StuckPage.waiting = asyncio.Event()
+        stream = audit.run_audit(["https://bad.example", "https://stuck.example"])
+        first = await stream.__anext__()
+        assert first.status == "error"
+        await asyncio.wait_for(StuckPage.waiting.wait(), timeout=2)
+        # Client disconnects while the other URL is still waiting for ad cards.
+        await asyncio.wait_for(stream.aclose(), timeout=2)
+    try:
+        asyncio.run(run())
+    finally:
+        StuckPage.waiting = None
@@ -0,0 +1,107 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image
+from fastapi.testclient import TestClient
+import app.main
+from app.models import AdRecord
+from app.services import media, metrics
+from app.services.media import MediaCache, sniff_media_type, find_duplicate_visuals, dhash_file, is_low_information
+
+def make_ad(advertiser, phash):
+    return AdRecord(advertiser=advertiser, snapshot_url=f"https://example.com/{advertiser}/{phash}", perceptual_hash=phash)
+
+def test_sniff_media_type():
+    assert sniff_media_type(b"\xff\xd8\xff\xe0\x00\x10JFIF") == ("image", "image/jpeg")
+    assert sniff_media_type(b"\x89PNG\r\n\x1a\n\x00\x00") == ("image", "image/png")
+    assert sniff_media_type(b"GIF89a\x01\x00") == ("image", "image/gif")
+    assert sniff_media_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == ("image", "image/webp")
+    assert sniff_media_type(b"\x00\x00\x00\x18ftypmp42") == ("video", "video/mp4")
+    assert sniff_media_type(b"\x1a\x45\xdf\xa3\x9f") == ("video", "video/webm")
+    assert sniff_media_type(b"<html>") == ("unknown", "application/octet-stream")
+
+def test_cache_is_content_addressed(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=1024)
+    key = cache.put(b"same bytes")
+    assert cache.put(b"same bytes") == key
+    assert os.listdir(tmp_path) == [key]
+    with open(cache.path(key), "rb") as f:
+        assert f.read() == b"same bytes"
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=10)
+    a = cache.put(b"aaaa")
+    b = cache.put(b"bbbb")
+    assert cache.path(a)  # touch a, so b is now the oldest
+    c = cache.put(b"cccc")
+    assert cache.path(b) is None
+    assert cache.path(a) and cache.path(c)
+    assert sorted(os.listdir(tmp_path)) == sorted([a, c])
+
+def test_cache_reloads_existing_files(tmp_path):
+    key = MediaCache(str(tmp_path)).put(b"persisted")
+    assert MediaCache(str(tmp_path)).path(key)
+
+def test_cache_rejects_non_key_paths(tmp_path):
+    cache = MediaCache(str(tmp_path))
+    assert cache.path("../etc/passwd") is None
+
+def test_find_duplicate_visuals_groups_across_advertisers():
+    ads = [
+        make_ad("A", "f0f0f0f0f0f0f0f0"),
+        make_ad("B", "f0f0f0f0f0f0f0f1"),  # 1 bit away from A
+        make_ad("C", "0f0f0f0f0f0f0f0f"),
+    ]
+    groups = find_duplicate_visuals(ads)
+    assert len(groups) == 1
+    assert groups[0]["advertisers"] == ["A", "B"]
+
+def test_find_duplicate_visuals_ignores_single_advertiser():
+    ads = [make_ad("A", "f0f0f0f0f0f0f0f0"), make_ad("A", "f0f0f0f0f0f0f0f0")]
+    assert find_duplicate_visuals(ads) == []
+
+def test_solid_colour_images_are_not_duplicates(tmp_path):
+    hashes = []
+    for colour in ("red", "blue"):
+        path = str(tmp_path / f"{colour}.png")
+        Image.new("RGB", (64, 64), colour).save(path)
+        hashes.append(dhash_file(path))
+    assert hashes[0] == hashes[1]
+    assert is_low_information(hashes[0])
+    assert find_duplicate_visuals([make_ad("A", hashes[0]), make_ad("B", hashes[1])]) == []
+
+def test_hash_failures_leave_hash_empty(tmp_path, monkeypatch):
+    cache = MediaCache(str(tmp_path))
+    key = cache.put(b"\x89PNG\r\n\x1a\nnot really")
+    monkeypatch.setattr(media, "media_cache", cache)
+    monkeypatch.setattr(media, "_phash_by_key", {})
+
+    def broken_pool():
+        raise BrokenProcessPool("worker died")
+    monkeypatch.setattr(media, "_get_hash_pool", broken_pool)
+
+    before = metrics.ERRORS.value(service="media", reason="hash_error")
+    assert asyncio.run(media.perceptual_hashes([key])) == {key: None}
+    assert metrics.ERRORS.value(service="media", reason="hash_error") == before + 1
+    assert key not in media._phash_by_key
+
+def test_media_endpoint_serves_cached_file(tmp_path, monkeypatch):
+    cache = MediaCache(str(tmp_path))
+    body = b"\x89PNG\r\n\x1a\n" + b"x" * 100
+    key = cache.put(body)
+    monkeypatch.setattr(app.main, "media_cache", cache)
+
+    response = TestClient(app.main.app).get(f"/api/media/{key}")
+    assert response.status_code == 200
+    assert response.content == body
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["etag"] == f'"{key}"'
+
+def test_media_endpoint_404s_when_file_evicted_after_lookup(tmp_path, monkeypatch):
+    class RacingCache:
+        def path(self, key):
+            return str(tmp_path / key)  # lookup succeeded, file already gone
+    monkeypatch.setattr(app.main, "media_cache", RacingCache())
+
+    response = TestClient(app.main.app).get(f"/api/media/{'a' * 64}")
+    assert response.status_code == 404
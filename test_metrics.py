@@ -0,0 +1,51 @@
+from fastapi.testclient import TestClient
+import app.main
+from app.main import app as api
+from app.services import audit, metrics
+from app.services.metrics import Histogram, _format_labels, _label_key
+
+def test_histogram_renders_cumulative_buckets():
+    hist = Histogram("test_seconds", "Test.", buckets=(0.1, 1.0))
+    hist.observe(0.05, stage="fetch")
+    hist.observe(0.1, stage="fetch")  # bounds are inclusive
+    hist.observe(0.5, stage="fetch")
+    hist.observe(7, stage="fetch")
+
+    assert hist.render() == [
+        "# HELP test_seconds Test.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="fetch",le="0.1"} 2',
+        'test_seconds_bucket{stage="fetch",le="1"} 3',
+        'test_seconds_bucket{stage="fetch",le="+Inf"} 4',
+        'test_seconds_sum{stage="fetch"} 7.65',
+        'test_seconds_count{stage="fetch"} 4',
+    ]
+
+def test_label_values_are_escaped():
+    key = _label_key({"reason": 'bad "quote"\\path\nnext'})
+    assert _format_labels(key) == '{reason="bad \\"quote\\"\\\\path\\nnext"}'
+    assert _format_labels(()) == ""
+
+def test_trace_header_on_json_response():
+    client = TestClient(api)
+    assert "server-timing" in client.get("/", headers={"X-Trace": "1"}).headers
+    assert "server-timing" not in client.get("/").headers
+
+def test_no_trace_header_on_streamed_response(monkeypatch):
+    def noop(job, country, max_ads):
+        pass
+    monkeypatch.setattr(audit, "STAGES", [("extract", noop, 1)])
+
+    response = TestClient(api).post("/api/bulk-audit", json={"urls": ["https://a.example"]}, headers={"X-Trace": "1"})
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+
+def test_unhandled_exception_counted_as_500(monkeypatch):
+    def boom():
+        raise RuntimeError("boom")
+    monkeypatch.setattr(app.main, "readiness", boom)
+
+    before = metrics.HTTP_REQUESTS.value(handler="ready_endpoint", method="GET", status="500")
+    response = TestClient(api, raise_server_exceptions=False).get("/api/ready")
+    assert response.status_code == 500
+    assert metrics.HTTP_REQUESTS.value(handler="ready_endpoint", method="GET", status="500") == before + 1
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import subprocess
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import media, warmup
+from bench_startup import LAZY_MODULES
+
+@pytest.fixture
+def stub_components(monkeypatch):
+    calls = []
+
+    def make(name):
+        def warm():
+            calls.append(name)
+        return warm
+
+    monkeypatch.setattr(warmup, "COMPONENTS", {name: make(name) for name in ("llm", "extractor", "caches", "browser")})
+    monkeypatch.setattr(warmup, "READY_COMPONENTS", ["llm", "extractor", "caches"])
+    monkeypatch.setattr(warmup, "_status", {})
+    return calls
+
+def test_warm_up_rejects_unknown_components(stub_components):
+    with pytest.raises(ValueError, match="gpu"):
+        asyncio.run(warmup.warm_up(["llm", "gpu"]))
+    assert stub_components == []
+
+    response = TestClient(app).post("/api/warmup", json={"components": ["gpu"]})
+    assert response.status_code == 400
+
+def test_ready_after_required_components_warm(stub_components):
+    client = TestClient(app)
+    assert client.get("/api/ready").status_code == 503
+
+    client.post("/api/warmup", json={"components": ["llm", "extractor"]})
+    assert client.get("/api/ready").status_code == 503
+
+    client.post("/api/warmup", json={"components": ["caches"]})
+    response = client.get("/api/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    assert "browser" not in stub_components
+
+def test_failed_component_is_not_ready(stub_components, monkeypatch):
+    def broken():
+        raise RuntimeError("no disk")
+    monkeypatch.setitem(warmup.COMPONENTS, "caches", broken)
+
+    status = asyncio.run(warmup.warm_up())
+    assert status["ready"] is False
+    assert status["components"]["caches"]["error"] == "no disk"
+
+def test_broken_hash_pool_is_replaced(monkeypatch):
+    class DeadPool:
+        def submit(self, *args):
+            future = Future()
+            future.set_exception(BrokenProcessPool("worker died"))
+            return future
+
+    monkeypatch.setattr(media, "_hash_pool", DeadPool())
+    with pytest.raises(BrokenProcessPool):
+        media.warm_hash_pool()
+    assert media._hash_pool is None
+
+def test_importing_app_loads_no_heavy_modules():
+    code = f"import sys, app.main; print([m for m in {LAZY_MODULES!r} if m in sys.modules])"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"